@@ -7,6 +7,14 @@ import pandas as pd
 from urllib.parse import urlparse
 import os
 from tiktok_scraper import TikTokScraper
+from extraction_strategies import ProfileNotFound
+from profiling import profiling_enabled, profile_section
+from work_queue import QUEUE_DB_ENV_VAR, ScrapeQueue, start_background_worker
+from cohort_rollups import COHORT_DB_ENV_VAR, DEFAULT_COHORT_DB, CohortStore, FOLLOWER_TIERS, METRICS
+
+# Shared work queue settings (only used when SCRAPE_QUEUE_DB is set)
+QUEUE_RESULT_MAX_AGE = 300
+QUEUE_WAIT_TIMEOUT = 30
 
 # Page configuration
 st.set_page_config(
@@ -26,6 +34,80 @@ def load_css():
 def init_scraper():
     return TikTokScraper()
 
+# Join the shared scrape work queue, if configured, with a worker for this node
+@st.cache_resource
+def init_queue_worker():
+    queue_path = os.environ.get(QUEUE_DB_ENV_VAR)
+    if not queue_path:
+        return None
+    # Every job this worker completes also goes into the cohort rollups
+    return start_background_worker(
+        ScrapeQueue(queue_path), init_scraper(), on_result=init_cohort_store().record_profile
+    )
+
+# Open the cohort rollup store, seeding it from queued results on first use
+@st.cache_resource
+def init_cohort_store():
+    store = CohortStore(os.environ.get(COHORT_DB_ENV_VAR, DEFAULT_COHORT_DB))
+    queue_path = os.environ.get(QUEUE_DB_ENV_VAR)
+    if queue_path and store.is_empty():
+        store.backfill(ScrapeQueue(queue_path).iter_results())
+    return store
+
+def record_cohort_profile(profile_data):
+    """Add a scraped profile to the cohort rollups without failing the page"""
+    try:
+        init_cohort_store().record_profile(profile_data)
+    except Exception as e:
+        print(f"Error recording cohort profile: {str(e)}")
+
+def fetch_profile_data(scraper, username, profiling=False):
+    """Scrape a profile, going through the shared work queue when one is configured"""
+    worker = init_queue_worker()
+    if worker is None:
+        with profile_section("get_profile_data", profiling):
+            profile_data = scraper.get_profile_data(username)
+        if profile_data:
+            record_cohort_profile(profile_data)
+        return profile_data
+    queue = worker.queue
+    
+    # Another node may have scraped this profile recently; a profiling run
+    # always scrapes so there is something to profile
+    if not profiling:
+        cached = queue.latest_result(username, max_age=QUEUE_RESULT_MAX_AGE)
+        if cached:
+            return cached
+    
+    # The scrape runs on the owning node's worker, which profiles it when asked
+    job_id = queue.enqueue(username, profile=profiling)
+    job = queue.wait_for_result(job_id, timeout=QUEUE_WAIT_TIMEOUT)
+    if job and job['status'] == 'done':
+        return job['result']
+    if job and job['status'] == 'failed':
+        # Missing profile or retries used up; scraping again won't help
+        return None
+    
+    # Timed out: take the job over so the owning worker doesn't scrape it too.
+    # If another worker is mid-scrape we can't take it and just scrape locally.
+    claimed = queue.claim_job(job_id, worker.worker_id)
+    try:
+        with profile_section("get_profile_data", profiling):
+            profile_data = scraper.get_profile_data(username, raise_not_found=True)
+    except ProfileNotFound as e:
+        if claimed:
+            queue.fail(job_id, worker.worker_id, f"Profile not found: {str(e)}", permanent=True)
+        return None
+    if claimed:
+        if profile_data:
+            queue.complete(job_id, worker.worker_id, profile_data)
+        else:
+            queue.fail(job_id, worker.worker_id, "No profile data returned")
+    # Queue workers record their own results; this scrape ran here, so record it
+    if profile_data:
+        record_cohort_profile(profile_data)
+    return profile_data
+
 def validate_tiktok_url(url):
     """Validate if the provided URL is a valid TikTok profile URL"""
     if not url:
@@ -298,6 +380,11 @@ def show_login_page():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # Cohort analytics across all stored profiles
+    if st.button("📈 Cohort Analytics", type="secondary", use_container_width=True):
+        st.session_state.page = "cohorts"
+        st.rerun()
+    
     # Footer
     st.markdown("---")
     st.markdown(
@@ -311,6 +398,7 @@ def show_dashboard_page():
     """Display the analytics dashboard page"""
     # Initialize scraper
     scraper = init_scraper()
+    profiling = profiling_enabled(st.query_params)
     
     # Main container
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
@@ -333,7 +421,7 @@ def show_dashboard_page():
                 return
             
             # Scrape profile data
-            profile_data = scraper.get_profile_data(username)
+            profile_data = fetch_profile_data(scraper, username, profiling)
             
             if profile_data:
                 # Add full name to profile data
@@ -343,7 +431,8 @@ def show_dashboard_page():
                 st.success(f"✅ Successfully retrieved data for {full_name}")
                 
                 # Display analytics dashboard
-                display_analytics_dashboard(profile_data)
+                with profile_section("display_analytics_dashboard", profiling):
+                    display_analytics_dashboard(profile_data)
             else:
                 st.error("❌ Failed to retrieve profile data. Please check the URL and try again.")
                 st.info("💡 Make sure the profile is public and the URL is correct.")
@@ -354,6 +443,93 @@ def show_dashboard_page():
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+def show_cohort_page():
+    """Display cohort analytics computed from the precomputed rollups"""
+    store = init_cohort_store()
+    
+    st.markdown('<div class="main-container">', unsafe_allow_html=True)
+    
+    if st.button("← Back to Search", type="secondary"):
+        st.session_state.page = "login"
+        st.rerun()
+    
+    st.markdown("## 📈 Cohort Analytics")
+    
+    dimensions = store.dimensions()
+    if not dimensions['regions']:
+        st.info("💡 No profiles analyzed yet. Search for a profile to start building cohorts.")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    
+    # Cohort filters; "All" leaves a dimension unconstrained
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        region = st.selectbox("Region", ["All"] + dimensions['regions'])
+    with col2:
+        verified = st.selectbox("Verified", ["All", "Yes", "No"])
+    with col3:
+        tier = st.selectbox("Followers", ["All"] + [name for name, _ in FOLLOWER_TIERS])
+    
+    region_filter = None if region == "All" else region
+    verified_filter = None if verified == "All" else verified == "Yes"
+    tier_filter = None if tier == "All" else tier
+    
+    summary = store.query(region_filter, verified_filter, tier_filter)
+    if not summary['count']:
+        st.warning("⚠️ No profiles match this cohort")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    
+    engagement = summary['engagement_rate']
+    metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+    metric_col1.metric("Profiles", format_number(summary['count']))
+    metric_col2.metric("Avg Engagement", f"{engagement['mean']:.2f}%")
+    metric_col3.metric("Median Engagement", f"{engagement['p50']:.2f}%")
+    metric_col4.metric("P90 Engagement", f"{engagement['p90']:.2f}%")
+    
+    # Summary per metric
+    labels = {
+        'engagement_rate': "Engagement Rate (%)",
+        'follower_count': "Followers",
+        'avg_likes_per_video': "Avg Likes/Video",
+        'influencer_score': "Influencer Score",
+        'credibility_score': "Credibility Score",
+    }
+    st.markdown("### 📊 Cohort Metrics")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Metric": labels[metric],
+                "Mean": round(summary[metric]['mean'], 2),
+                "Median": round(summary[metric]['p50'], 2),
+                "P90": round(summary[metric]['p90'], 2),
+            }
+            for metric in METRICS
+        ]),
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    # Breakdown by rollup cell
+    st.markdown("### 🧩 Breakdown")
+    cells = store.cells(region_filter, verified_filter, tier_filter)
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Region": cell_region,
+                "Verified": "Yes" if cell_verified else "No",
+                "Followers": cell_tier,
+                "Profiles": rollup.count,
+                "Avg Engagement (%)": round(rollup.sums['engagement_rate'] / rollup.count, 2),
+            }
+            for cell_region, cell_verified, cell_tier, rollup in cells
+        ]).sort_values("Profiles", ascending=False),
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
 def main():
     # Load custom CSS
     load_css()
@@ -367,6 +543,8 @@ def main():
         show_login_page()
     elif st.session_state.page == "dashboard":
         show_dashboard_page()
+    elif st.session_state.page == "cohorts":
+        show_cohort_page()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,280 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+
+# Cohort analytics over every stored profile result. Rollups are kept per
+# region x verified x follower tier and updated incrementally on each write,
+# so a cohort query only merges a handful of precomputed cells.
+COHORT_DB_ENV_VAR = "COHORT_DB"
+DEFAULT_COHORT_DB = "cohort_rollups.db"
+
+METRICS = ['engagement_rate', 'follower_count', 'avg_likes_per_video', 'influencer_score', 'credibility_score']
+
+FOLLOWER_TIERS = [
+    ('Nano (<10K)', 0),
+    ('Micro (10K-100K)', 10_000),
+    ('Mid (100K-1M)', 100_000),
+    ('Macro (1M-10M)', 1_000_000),
+    ('Mega (10M+)', 10_000_000),
+]
+
+UNKNOWN_REGION = "Unknown"
+
+
+def follower_tier(follower_count):
+    tier = FOLLOWER_TIERS[0][0]
+    for name, minimum in FOLLOWER_TIERS:
+        if follower_count >= minimum:
+            tier = name
+    return tier
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram (DDSketch style) with about 1% relative error.
+    Unlike most sketches it supports removal, so a profile that is re-scraped
+    can be moved out of its old cell.
+    """
+
+    gamma = 1.02
+    min_value = 1e-6
+
+    def __init__(self, buckets=None, zero_count=0):
+        self.buckets = {int(k): v for k, v in (buckets or {}).items()}
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / math.log(self.gamma))
+
+    def add(self, value, weight=1):
+        if value <= self.min_value:
+            self.zero_count += weight
+            return
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + weight
+        if self.buckets[index] <= 0:
+            del self.buckets[index]
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q):
+        total = self.count
+        if total <= 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # DDSketch estimate for bucket (gamma^(i-1), gamma^i]: within
+                # (gamma-1)/(gamma+1) relative error of any value in it
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'buckets': self.buckets, 'zero_count': self.zero_count}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('buckets'), data.get('zero_count', 0))
+
+
+class CohortRollup:
+    """
+    Count, sums and quantile sketches for one cell or a merge of several cells
+    """
+
+    def __init__(self, count=0, sums=None, sketches=None):
+        self.count = count
+        self.sums = sums or {metric: 0.0 for metric in METRICS}
+        self.sketches = sketches or {metric: QuantileSketch() for metric in METRICS}
+
+    def add(self, metrics, sign=1):
+        self.count += sign
+        for metric in METRICS:
+            value = float(metrics.get(metric, 0) or 0)
+            self.sums[metric] += sign * value
+            self.sketches[metric].add(value, weight=sign)
+
+    def merge(self, other):
+        self.count += other.count
+        for metric in METRICS:
+            self.sums[metric] += other.sums[metric]
+            self.sketches[metric].merge(other.sketches[metric])
+
+    def summary(self):
+        result = {'count': self.count}
+        for metric in METRICS:
+            sketch = self.sketches[metric]
+            result[metric] = {
+                'mean': self.sums[metric] / self.count if self.count else None,
+                'p50': sketch.quantile(0.5),
+                'p90': sketch.quantile(0.9),
+            }
+        return result
+
+    def to_json(self):
+        return json.dumps({
+            'count': self.count,
+            'sums': self.sums,
+            'sketches': {metric: sketch.to_dict() for metric, sketch in self.sketches.items()},
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketches = {metric: QuantileSketch.from_dict(data['sketches'].get(metric, {})) for metric in METRICS}
+        sums = {metric: data['sums'].get(metric, 0.0) for metric in METRICS}
+        return cls(data['count'], sums, sketches)
+
+
+class CohortStore:
+    """
+    SQLite store of the latest result per profile plus incrementally maintained rollups
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS cohort_profiles (
+                username TEXT PRIMARY KEY,
+                region TEXT NOT NULL,
+                verified INTEGER NOT NULL,
+                tier TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cohort_rollups (
+                region TEXT NOT NULL,
+                verified INTEGER NOT NULL,
+                tier TEXT NOT NULL,
+                rollup TEXT NOT NULL,
+                PRIMARY KEY (region, verified, tier)
+            );
+        """)
+
+    def _cell_key(self, profile_data):
+        region = str(profile_data.get('region') or '').strip().upper() or UNKNOWN_REGION
+        verified = 1 if profile_data.get('verified') else 0
+        tier = follower_tier(int(profile_data.get('follower_count', 0) or 0))
+        return region, verified, tier
+
+    def _apply(self, conn, cell, metrics, sign):
+        row = conn.execute(
+            "SELECT rollup FROM cohort_rollups WHERE region = ? AND verified = ? AND tier = ?", cell
+        ).fetchone()
+        rollup = CohortRollup.from_json(row['rollup']) if row else CohortRollup()
+        rollup.add(metrics, sign)
+        if rollup.count <= 0:
+            conn.execute("DELETE FROM cohort_rollups WHERE region = ? AND verified = ? AND tier = ?", cell)
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO cohort_rollups (region, verified, tier, rollup) VALUES (?, ?, ?, ?)",
+                cell + (rollup.to_json(),)
+            )
+
+    def record_profile(self, profile_data):
+        """
+        Store a processed profile and move its contribution between rollup cells.
+        Re-recording a username replaces its previous values.
+        """
+        username = str(profile_data.get('username', '')).lower()
+        if not username:
+            return
+
+        cell = self._cell_key(profile_data)
+        metrics = {metric: profile_data.get(metric, 0) for metric in METRICS}
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute(
+                "SELECT region, verified, tier, metrics FROM cohort_profiles WHERE username = ?", (username,)
+            ).fetchone()
+            if old:
+                self._apply(conn, (old['region'], old['verified'], old['tier']), json.loads(old['metrics']), -1)
+            self._apply(conn, cell, metrics, 1)
+            conn.execute(
+                "INSERT OR REPLACE INTO cohort_profiles (username, region, verified, tier, metrics, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (username,) + cell + (json.dumps(metrics), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def is_empty(self):
+        return self._connect().execute("SELECT 1 FROM cohort_profiles LIMIT 1").fetchone() is None
+
+    def backfill(self, profiles):
+        """
+        Record an iterable of stored profile results, e.g. ScrapeQueue.iter_results()
+        """
+        count = 0
+        for profile_data in profiles:
+            self.record_profile(profile_data)
+            count += 1
+        return count
+
+    def dimensions(self):
+        """
+        Region, verified and tier values that currently have at least one profile
+        """
+        rows = self._connect().execute("SELECT region, verified, tier FROM cohort_rollups").fetchall()
+        return {
+            'regions': sorted({row['region'] for row in rows}),
+            'verified': sorted({bool(row['verified']) for row in rows}),
+            'tiers': [name for name, _ in FOLLOWER_TIERS if name in {row['tier'] for row in rows}],
+        }
+
+    def cells(self, region=None, verified=None, tier=None):
+        """
+        Matching rollup cells as (region, verified, tier, CohortRollup); None means any value
+        """
+        clauses, params = [], []
+        for column, value in (('region', region), ('verified', verified), ('tier', tier)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(int(value) if column == 'verified' else value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT region, verified, tier, rollup FROM cohort_rollups {where}", params
+        )
+        return [
+            (row['region'], bool(row['verified']), row['tier'], CohortRollup.from_json(row['rollup']))
+            for row in rows
+        ]
+
+    def query(self, region=None, verified=None, tier=None):
+        """
+        Merged summary (count, mean, p50, p90 per metric) for a cohort
+        """
+        total = CohortRollup()
+        for _, _, _, rollup in self.cells(region, verified, tier):
+            total.merge(rollup)
+        return total.summary()
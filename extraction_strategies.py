@@ -0,0 +1,294 @@
+import itertools
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import quote
+
+# TikTok status codes meaning the account does not exist or cannot be shown
+NOT_FOUND_STATUS_CODES = {10202, 10221, 10222, 10223}
+
+
+class StrategyError(Exception):
+    """Raised by a strategy when its backend is broken (blocked, erroring or changed layout)"""
+
+
+class ProfileNotFound(Exception):
+    """Raised when the backend worked but the account does not exist; never trips a breaker"""
+
+
+class StrategyStats:
+    """
+    Latency / success-rate tracker with a simple circuit breaker for one strategy.
+    Latency and success rate are exponentially smoothed, so a strategy that
+    recovers from an outage sheds its old failures.
+    """
+
+    MIN_SUCCESS_RATE = 0.01
+
+    def __init__(self, failure_threshold=3, cooldown=60.0, smoothing=0.3):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+
+        self.attempts = 0
+        self.successes = 0
+        self.consecutive_failures = 0
+        self.avg_latency = None  # successful calls only
+        self.success_rate = None
+        self.last_attempt = None
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow_request(self):
+        """
+        Closed circuit: always allow. Open circuit: skip until the cool-down has
+        elapsed, then let a single trial request through (half-open).
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            self.attempts += 1
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+            self.last_attempt = time.monotonic()
+            self._update_latency(latency)
+            self._update_success_rate(1.0)
+
+    def record_healthy(self):
+        """
+        Backend answered correctly without producing a profile (e.g. not found):
+        close the circuit but leave the latency and success counters alone
+        """
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+            self.last_attempt = time.monotonic()
+
+    def record_failure(self):
+        with self._lock:
+            self.attempts += 1
+            self.consecutive_failures += 1
+            self.last_attempt = time.monotonic()
+            self._update_success_rate(0.0)
+            # A failed half-open trial re-opens immediately with a fresh cool-down
+            if self.trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    @property
+    def expected_cost(self):
+        """
+        Average successful latency scaled by the expected number of tries
+        """
+        if self.avg_latency is None:
+            return None
+        return self.avg_latency / max(self.success_rate, self.MIN_SUCCESS_RATE)
+
+    def _update_latency(self, latency):
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = self.smoothing * latency + (1 - self.smoothing) * self.avg_latency
+
+    def _update_success_rate(self, outcome):
+        if self.success_rate is None:
+            self.success_rate = outcome
+        else:
+            self.success_rate = self.smoothing * outcome + (1 - self.smoothing) * self.success_rate
+
+    def snapshot(self):
+        """Plain dict view of the tracker, handy for logging or an admin page"""
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'successes': self.successes,
+                'success_rate': round(self.success_rate, 3) if self.success_rate is not None else None,
+                'avg_latency': round(self.avg_latency, 3) if self.avg_latency is not None else None,
+                'circuit_open': self.is_open,
+            }
+
+
+class ExtractionStrategy(ABC):
+    """
+    Base class for a fetch/extract backend. Subclasses return the raw ``info``
+    dict consumed by ``TikTokScraper._process_profile_data``, raise
+    ProfileNotFound for a missing account, or StrategyError when the backend is broken.
+    """
+
+    name = "base"
+    timeout = 10
+
+    @abstractmethod
+    def fetch_info(self, scraper, username):
+        """Fetch and extract the raw info dict for a username"""
+
+    def check_status(self, response):
+        if response.status_code == 404:
+            raise ProfileNotFound("Profile does not exist")
+        if response.status_code != 200:
+            raise StrategyError(f"Unable to fetch profile. Status code: {response.status_code}")
+
+
+class EmbeddedJsonStrategy(ExtractionStrategy):
+    """
+    Desktop profile page; stats are read from the embedded hydration JSON
+    """
+
+    name = "embedded_json"
+    url_template = "https://www.tiktok.com/@{username}"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    def fetch_info(self, scraper, username):
+        url = self.url_template.format(username=quote(username))
+        response = scraper.session.get(url, headers=self.headers, timeout=self.timeout)
+        self.check_status(response)
+
+        html_content = response.text
+
+        # Missing accounts still return 200, with an error status in the user-detail scope
+        status = re.search(r'"webapp.user-detail":\{"statusCode":(\d+)', html_content)
+        if status and int(status.group(1)) in NOT_FOUND_STATUS_CODES:
+            raise ProfileNotFound("Profile does not exist")
+
+        info = scraper._extract_info_from_html(html_content)
+
+        # Anything else without the core stats means the page layout changed
+        if info.get('followers', '').startswith('No '):
+            raise StrategyError("Profile stats not found in page")
+
+        return info
+
+
+class UserDetailApiStrategy(ExtractionStrategy):
+    """
+    Lightweight JSON endpoint used by the web app; no HTML to download or parse
+    """
+
+    name = "user_detail_api"
+    url = "https://www.tiktok.com/api/user/detail/"
+
+    def fetch_info(self, scraper, username):
+        params = {'uniqueId': username, 'aid': '1988'}
+        response = scraper.session.get(self.url, params=params, timeout=self.timeout)
+        self.check_status(response)
+
+        try:
+            data = response.json()
+        except ValueError:
+            raise StrategyError("Unexpected user detail response")
+
+        if data.get('statusCode') in NOT_FOUND_STATUS_CODES:
+            raise ProfileNotFound("Profile does not exist")
+
+        try:
+            user = data['userInfo']['user']
+            stats = data['userInfo']['stats']
+        except (KeyError, TypeError):
+            raise StrategyError("Unexpected user detail response")
+
+        # Mirror the string values produced by the HTML regex patterns
+        signature = user.get('signature', '')
+        info = {
+            'user_id': str(user.get('id', '')),
+            'unique_id': user.get('uniqueId', username),
+            'nickname': user.get('nickname', ''),
+            'followers': str(stats.get('followerCount', 0)),
+            'following': str(stats.get('followingCount', 0)),
+            'likes': str(stats.get('heartCount', stats.get('heart', 0))),
+            'videos': str(stats.get('videoCount', 0)),
+            'signature': signature,
+            'verified': str(bool(user.get('verified', False))).lower(),
+            'secUid': user.get('secUid', ''),
+            'commentSetting': str(user.get('commentSetting', '')),
+            'privateAccount': str(bool(user.get('privateAccount', False))).lower(),
+            'region': user.get('region', ''),
+            'heart': str(stats.get('heart', 0)),
+            'diggCount': str(stats.get('diggCount', 0)),
+            'friendCount': str(stats.get('friendCount', 0)),
+            'profile_pic': user.get('avatarLarger', ''),
+        }
+        info['social_links'] = scraper._extract_social_links('', signature)
+        return info
+
+
+class StrategyChain:
+    """
+    Ordered chain of extraction strategies. Each call tries the cheapest strategy
+    first (by successful latency and success rate), skipping any whose circuit
+    breaker is open. Every ``probe_every`` calls the least recently tried of the
+    other strategies goes first instead, so their stats stay current.
+    """
+
+    def __init__(self, strategies, failure_threshold=3, cooldown=60.0, probe_every=20):
+        self.strategies = list(strategies)
+        self.stats = {
+            s.name: StrategyStats(failure_threshold=failure_threshold, cooldown=cooldown)
+            for s in self.strategies
+        }
+        self.probe_every = probe_every
+        self._calls = itertools.count(1)
+
+    def ordered(self, probe=False):
+        """
+        Strategies that have succeeded before come first, sorted by expected cost;
+        never-successful ones keep their declared order after them. With ``probe``
+        the least recently tried strategy behind the leader is moved to the front.
+        """
+        def sort_key(strategy):
+            cost = self.stats[strategy.name].expected_cost
+            return (1, 0.0) if cost is None else (0, cost)
+
+        order = sorted(self.strategies, key=sort_key)
+        if probe and len(order) > 1:
+            probed = min(order[1:], key=lambda s: self.stats[s.name].last_attempt or float('-inf'))
+            order.remove(probed)
+            order.insert(0, probed)
+        return order
+
+    def run(self, scraper, username):
+        """
+        Return the info dict from the first strategy that succeeds, or None.
+        ProfileNotFound ends the chain and is re-raised without tripping any breaker.
+        """
+        probe = self.probe_every and next(self._calls) % self.probe_every == 0
+        for strategy in self.ordered(probe=probe):
+            stats = self.stats[strategy.name]
+            if not stats.allow_request():
+                continue
+
+            start = time.monotonic()
+            try:
+                info = strategy.fetch_info(scraper, username)
+            except ProfileNotFound:
+                stats.record_healthy()
+                raise
+            except Exception as e:
+                stats.record_failure()
+                print(f"Strategy {strategy.name} failed for {username}: {str(e)}")
+                continue
+
+            stats.record_success(time.monotonic() - start)
+            return info
+
+        return None
+
+    def report(self):
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
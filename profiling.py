@@ -0,0 +1,184 @@
+import cProfile
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Profiling is opt-in: set TIKTOK_PROFILE=1 for every request, or set
+# TIKTOK_PROFILE_TOKEN and open the app with ?profile=<token> for a single run.
+PROFILE_ENV_VAR = "TIKTOK_PROFILE"
+PROFILE_TOKEN_ENV_VAR = "TIKTOK_PROFILE_TOKEN"
+PROFILE_DIR_ENV_VAR = "TIKTOK_PROFILE_DIR"
+
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 25
+
+_local = threading.local()
+_lock = threading.Lock()
+_active_count = 0
+_tracemalloc_owned = False
+
+
+def profiling_enabled(query_params=None):
+    """
+    Check the env var switch, then the admin query parameter
+    """
+    if os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes"):
+        return True
+
+    token = os.environ.get(PROFILE_TOKEN_ENV_VAR)
+    if token and query_params is not None:
+        supplied = query_params.get("profile")
+        return bool(supplied) and hmac.compare_digest(str(supplied).encode(), token.encode())
+
+    return False
+
+
+def profile_section(name, enabled):
+    """
+    Return a context manager that profiles the enclosed block when enabled.
+    When disabled this is a plain nullcontext, so nothing is traced or sampled.
+    """
+    if not enabled:
+        return nullcontext()
+    return _profiled(name)
+
+
+def memory_checkpoint(label):
+    """
+    Record a tracemalloc snapshot from inside a profiled section, e.g. while a
+    large response body or parse tree is still alive. No-op when profiling is off.
+    """
+    if not _active_count:
+        return
+    session = getattr(_local, "session", None)
+    if session is not None:
+        session.checkpoints.append((label, tracemalloc.take_snapshot()))
+
+
+class _ProfileSession:
+    def __init__(self, name):
+        self.name = name
+        self.checkpoints = []
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the stack of one thread at a fixed interval and counts collapsed stacks
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _output_dir():
+    path = os.environ.get(PROFILE_DIR_ENV_VAR, "profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _start_tracemalloc():
+    global _active_count, _tracemalloc_owned
+    with _lock:
+        if _active_count == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _active_count += 1
+        if _active_count == 1:
+            tracemalloc.reset_peak()
+
+
+def _stop_tracemalloc():
+    global _active_count, _tracemalloc_owned
+    with _lock:
+        _active_count -= 1
+        if _active_count == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+@contextmanager
+def _profiled(name):
+    session = _ProfileSession(name)
+    previous_session = getattr(_local, "session", None)
+    _local.session = session
+
+    _start_tracemalloc()
+    sampler = _StackSampler(threading.get_ident())
+    profiler = cProfile.Profile()
+
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler already owns the interpreter; keep sampling and memory only
+        profiler = None
+    try:
+        yield session
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+        _, peak = tracemalloc.get_traced_memory()
+        final_snapshot = tracemalloc.take_snapshot()
+        _local.session = previous_session
+        _stop_tracemalloc()
+
+        try:
+            _write_outputs(session, profiler, sampler, final_snapshot, peak, elapsed)
+        except Exception as e:
+            print(f"Error writing profile output for {name}: {str(e)}")
+
+
+def _write_outputs(session, profiler, sampler, final_snapshot, peak, elapsed):
+    """
+    Write <name>-<stamp>.pstats (snakeviz, gprof2dot), .collapsed (flamegraph.pl,
+    speedscope) and -memory.txt (top allocations per checkpoint)
+    """
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}-{threading.get_ident()}"
+    base = os.path.join(_output_dir(), f"{session.name}-{stamp}")
+
+    if profiler is not None:
+        profiler.dump_stats(f"{base}.pstats")
+
+    with open(f"{base}.collapsed", "w") as f:
+        for stack, count in sampler.stacks.items():
+            f.write(f"{stack} {count}\n")
+
+    with open(f"{base}-memory.txt", "w") as f:
+        f.write(f"section: {session.name}\n")
+        f.write(f"elapsed: {elapsed:.3f}s\n")
+        f.write(f"peak traced memory: {peak / 1024:.1f} KiB\n")
+        for label, snapshot in session.checkpoints + [("end", final_snapshot)]:
+            f.write(f"\n== {label} ==\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+
+    print(f"Profile for {session.name} written to {base}.*")
@@ -0,0 +1,104 @@
+import random
+import statistics
+
+import pytest
+
+from cohort_rollups import CohortStore, QuantileSketch, follower_tier
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CohortStore(str(tmp_path / "cohorts.db"))
+
+
+def profile(username, region="US", verified=True, followers=500_000, engagement_rate=2.0):
+    return {
+        'username': username,
+        'region': region,
+        'verified': verified,
+        'follower_count': followers,
+        'engagement_rate': engagement_rate,
+    }
+
+
+def test_sketch_removal_restores_previous_state():
+    sketch = QuantileSketch()
+    for value in (0.0, 1.5, 3.0, 3.0, 10.0):
+        sketch.add(value)
+    before = sketch.to_dict()
+
+    sketch.add(7.0)
+    sketch.add(0.0)
+    sketch.add(7.0, weight=-1)
+    sketch.add(0.0, weight=-1)
+
+    assert sketch.to_dict() == before
+    assert sketch.count == 5
+
+
+def test_sketch_quantiles_within_relative_error():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(1, 1) for _ in range(5000)]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    ordered = sorted(values)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+
+
+def test_sketch_round_trips_through_json_dict():
+    sketch = QuantileSketch()
+    for value in (0.0, 0.5, 2.0):
+        sketch.add(value)
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_query_matches_exact_values(store):
+    rng = random.Random(7)
+    rates = []
+    for i in range(300):
+        rate = rng.uniform(0.1, 8.0)
+        store.record_profile(profile(f"user{i}", engagement_rate=rate))
+        rates.append(rate)
+    store.record_profile(profile("other", region="GB", engagement_rate=50.0))
+
+    summary = store.query(region="US", verified=True, tier=follower_tier(500_000))
+    assert summary['count'] == 300
+    assert summary['engagement_rate']['mean'] == pytest.approx(statistics.mean(rates))
+    assert summary['engagement_rate']['p50'] == pytest.approx(statistics.median(rates), rel=0.03)
+    assert store.query()['count'] == 301
+
+
+def test_rescraped_profile_moves_between_cells(store):
+    store.record_profile(profile("alice", followers=50_000, engagement_rate=4.0))
+    store.record_profile(profile("bob", followers=50_000, engagement_rate=2.0))
+
+    # Alice grows into the next tier; her old contribution leaves the old cell
+    store.record_profile(profile("alice", followers=2_000_000, engagement_rate=1.0))
+
+    micro = store.query(tier=follower_tier(50_000))
+    macro = store.query(tier=follower_tier(2_000_000))
+    assert micro['count'] == 1
+    assert micro['engagement_rate']['mean'] == pytest.approx(2.0)
+    assert macro['count'] == 1
+    assert macro['engagement_rate']['mean'] == pytest.approx(1.0)
+    assert store.query()['count'] == 2
+
+
+def test_empty_cell_is_deleted(store):
+    store.record_profile(profile("carol", region="FR", verified=False))
+    assert store.dimensions()['regions'] == ["FR"]
+
+    store.record_profile(profile("carol", region="DE", verified=False))
+    assert store.dimensions()['regions'] == ["DE"]
+    assert store.cells(region="FR") == []
+
+
+def test_missing_region_goes_to_unknown(store):
+    store.record_profile(profile("dave", region=""))
+    assert store.dimensions()['regions'] == ["Unknown"]
@@ -0,0 +1,142 @@
+import time
+
+import pytest
+
+from extraction_strategies import (
+    ExtractionStrategy,
+    ProfileNotFound,
+    StrategyChain,
+    StrategyError,
+    StrategyStats,
+)
+
+
+class StubStrategy(ExtractionStrategy):
+    def __init__(self, name, outcomes=None, latency=0.0):
+        self.name = name
+        self.outcomes = list(outcomes or [])
+        self.latency = latency
+        self.calls = 0
+
+    def fetch_info(self, scraper, username):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        outcome = self.outcomes.pop(0) if self.outcomes else 'ok'
+        if outcome == 'error':
+            raise StrategyError("backend broken")
+        if outcome == 'missing':
+            raise ProfileNotFound("no such user")
+        return {'source': self.name, 'username': username}
+
+
+def test_circuit_opens_after_failure_threshold():
+    stats = StrategyStats(failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        assert stats.allow_request()
+        stats.record_failure()
+    assert not stats.is_open
+
+    stats.record_failure()
+    assert stats.is_open
+    assert not stats.allow_request()
+
+
+def test_half_open_allows_a_single_trial():
+    stats = StrategyStats(failure_threshold=1, cooldown=0.05)
+    stats.record_failure()
+    assert not stats.allow_request()
+
+    time.sleep(0.06)
+    assert stats.allow_request()
+    assert not stats.allow_request()
+
+    stats.record_success(0.01)
+    assert not stats.is_open
+    assert stats.allow_request()
+
+
+def test_failed_trial_reopens_immediately():
+    stats = StrategyStats(failure_threshold=3, cooldown=0.05)
+    for _ in range(3):
+        stats.record_failure()
+
+    time.sleep(0.06)
+    assert stats.allow_request()
+    stats.record_failure()
+    assert stats.is_open
+    assert not stats.allow_request()
+
+
+def test_profile_not_found_does_not_trip_breaker():
+    strategy = StubStrategy('primary', outcomes=['missing'] * 5)
+    chain = StrategyChain([strategy], failure_threshold=3, cooldown=60)
+
+    for _ in range(5):
+        with pytest.raises(ProfileNotFound):
+            chain.run(None, 'ghost')
+
+    assert not chain.stats['primary'].is_open
+    assert chain.stats['primary'].attempts == 0
+    assert chain.run(None, 'realuser') == {'source': 'primary', 'username': 'realuser'}
+
+
+def test_chain_fails_over_to_next_strategy():
+    broken = StubStrategy('broken', outcomes=['error'])
+    backup = StubStrategy('backup')
+    chain = StrategyChain([broken, backup], probe_every=0)
+
+    assert chain.run(None, 'user')['source'] == 'backup'
+    assert [s.name for s in chain.ordered()] == ['backup', 'broken']
+
+
+def test_open_circuit_is_skipped():
+    broken = StubStrategy('broken', outcomes=['error'] * 10)
+    chain = StrategyChain([broken], failure_threshold=2, cooldown=60, probe_every=0)
+
+    for _ in range(4):
+        assert chain.run(None, 'user') is None
+
+    # Two failures open the breaker; later calls don't pay for the broken backend
+    assert broken.calls == 2
+    assert chain.stats['broken'].is_open
+
+
+def test_ordering_by_expected_cost():
+    slow = StubStrategy('slow', latency=0.03)
+    fast = StubStrategy('fast', latency=0.001)
+    chain = StrategyChain([slow, fast], probe_every=0)
+
+    chain.stats['slow'].record_success(0.03)
+    chain.stats['fast'].record_success(0.001)
+    assert [s.name for s in chain.ordered()] == ['fast', 'slow']
+
+    # A flaky fast strategy costs more than a reliable slow one
+    for _ in range(10):
+        chain.stats['fast'].record_failure()
+    assert [s.name for s in chain.ordered()] == ['slow', 'fast']
+
+
+def test_success_rate_recovers_after_outage():
+    stats = StrategyStats(failure_threshold=100)
+    stats.record_success(0.01)
+    for _ in range(10):
+        stats.record_failure()
+    assert stats.success_rate < 0.1
+
+    for _ in range(10):
+        stats.record_success(0.01)
+    assert stats.success_rate > 0.9
+
+
+def test_probe_retries_strategy_that_never_succeeded():
+    primary = StubStrategy('primary', outcomes=['error'])
+    backup = StubStrategy('backup')
+    chain = StrategyChain([primary, backup], failure_threshold=3, probe_every=5)
+
+    for _ in range(5):
+        chain.run(None, 'user')
+
+    # One transient failure, then the probe measured the primary again
+    assert primary.calls == 2
+    assert chain.stats['primary'].avg_latency is not None
@@ -0,0 +1,64 @@
+import pstats
+from contextlib import nullcontext
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def profile_env(monkeypatch, tmp_path):
+    monkeypatch.delenv(profiling.PROFILE_ENV_VAR, raising=False)
+    monkeypatch.delenv(profiling.PROFILE_TOKEN_ENV_VAR, raising=False)
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV_VAR, str(tmp_path))
+    return monkeypatch
+
+
+def test_profiling_enabled_by_env_var(profile_env):
+    assert not profiling.profiling_enabled()
+    profile_env.setenv(profiling.PROFILE_ENV_VAR, "1")
+    assert profiling.profiling_enabled()
+
+
+def test_profiling_enabled_by_admin_token(profile_env):
+    # Without a configured token the query parameter is ignored
+    assert not profiling.profiling_enabled({"profile": "secret"})
+
+    profile_env.setenv(profiling.PROFILE_TOKEN_ENV_VAR, "secret")
+    assert profiling.profiling_enabled({"profile": "secret"})
+    assert not profiling.profiling_enabled({"profile": "wrong"})
+    assert not profiling.profiling_enabled({})
+    assert not profiling.profiling_enabled(None)
+
+
+def test_disabled_section_is_a_nullcontext(profile_env, tmp_path):
+    section = profiling.profile_section("get_profile_data", False)
+    assert isinstance(section, nullcontext)
+
+    with section:
+        profiling.memory_checkpoint("ignored")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_enabled_section_writes_profile_files(profile_env, tmp_path):
+    with profiling.profile_section("get_profile_data", True):
+        payload = ["x" * 100 for _ in range(10_000)]
+        profiling.memory_checkpoint("after_html_parse")
+        sum(i * i for i in range(200_000))
+    del payload
+
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert len(names) == 3
+    base = next(name for name in names if name.endswith(".pstats"))[:-len(".pstats")]
+    assert names == sorted([f"{base}-memory.txt", f"{base}.collapsed", f"{base}.pstats"])
+    assert base.startswith("get_profile_data-")
+
+    pstats.Stats(str(tmp_path / f"{base}.pstats"))
+
+    collapsed = (tmp_path / f"{base}.collapsed").read_text().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+
+    memory = (tmp_path / f"{base}-memory.txt").read_text()
+    assert "peak traced memory" in memory
+    assert "== after_html_parse ==" in memory
+    assert "== end ==" in memory
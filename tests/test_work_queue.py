@@ -0,0 +1,155 @@
+import multiprocessing
+import time
+
+import pytest
+
+from extraction_strategies import ProfileNotFound
+from work_queue import ConsistentHashRing, QueueWorker, RING_SIZE, ScrapeQueue, hash_point
+
+
+class FakeScraper:
+    def get_profile_data(self, username, raise_not_found=False):
+        time.sleep(0.005)
+        return {'username': username}
+
+
+class MissingProfileScraper:
+    def __init__(self):
+        self.calls = 0
+
+    def get_profile_data(self, username, raise_not_found=False):
+        self.calls += 1
+        if raise_not_found:
+            raise ProfileNotFound("no such user")
+        return None
+
+
+def _run_worker(path, worker_id, results):
+    queue = ScrapeQueue(path)
+    claimed = []
+
+    class RecordingScraper(FakeScraper):
+        def get_profile_data(self, username, raise_not_found=False):
+            claimed.append(username)
+            return super().get_profile_data(username, raise_not_found)
+
+    QueueWorker(queue, RecordingScraper(), worker_id=worker_id, poll_interval=0.05).run(idle_exit=2.0)
+    results.put((worker_id, claimed))
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+def test_expired_lease_is_reclaimed(queue_path):
+    queue = ScrapeQueue(queue_path, lease_seconds=0.05)
+    job_id = queue.enqueue("alice")
+    ring = ConsistentHashRing(["w1", "w2"])
+    owner = ring.node_for("alice")
+    other = "w2" if owner == "w1" else "w1"
+
+    assert [job['id'] for job in queue.claim(owner, ring=ring)] == [job_id]
+    assert queue.claim(owner, ring=ring) == []
+
+    time.sleep(0.1)
+    assert [job['id'] for job in queue.claim(owner, ring=ring)] == [job_id]
+    assert queue.get_job(job_id)['attempts'] == 2
+
+    # The first holder can no longer complete once the lease was taken over
+    time.sleep(0.1)
+    assert queue.claim_job(job_id, other)
+    assert not queue.complete(job_id, owner, {'username': 'alice'})
+    assert queue.complete(job_id, other, {'username': 'alice'})
+    assert queue.get_job(job_id)['status'] == 'done'
+
+
+def test_fail_marks_job_failed_after_max_attempts(queue_path):
+    queue = ScrapeQueue(queue_path, max_attempts=2, retry_delay=0)
+    job_id = queue.enqueue("bob")
+    ring = ConsistentHashRing(["w1"])
+
+    queue.claim("w1", ring=ring)
+    assert queue.fail(job_id, "w1", "boom")
+    assert queue.get_job(job_id)['status'] == 'pending'
+
+    queue.claim("w1", ring=ring)
+    assert queue.fail(job_id, "w1", "boom")
+    job = queue.get_job(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'boom'
+    assert queue.claim("w1", ring=ring) == []
+
+
+def test_missing_profile_fails_without_retry(queue_path):
+    queue = ScrapeQueue(queue_path, max_attempts=3, retry_delay=0)
+    job_id = queue.enqueue("ghost")
+    scraper = MissingProfileScraper()
+    worker = QueueWorker(queue, scraper, worker_id="w1")
+
+    assert worker.run_once() == 1
+    assert worker.run_once() == 0
+
+    job = queue.get_job(job_id)
+    assert job['status'] == 'failed'
+    assert job['attempts'] == 1
+    assert job['error'].startswith("Profile not found")
+    assert scraper.calls == 1
+
+
+def test_enqueue_deduplicates_active_jobs(queue_path):
+    queue = ScrapeQueue(queue_path)
+    assert queue.enqueue("@Carol") == queue.enqueue("carol")
+
+
+def test_owned_ranges_agree_with_node_for():
+    nodes = ["w1", "w2", "w3"]
+    ring = ConsistentHashRing(nodes)
+    ranges = {node: ring.owned_ranges(node) for node in nodes}
+    points = sorted(hash_point(f"{node}#{i}") for node in nodes for i in range(ring.replicas))
+
+    def owners(point):
+        return [node for node in nodes if any(low <= point <= high for low, high in ranges[node])]
+
+    keys = [f"user{i}" for i in range(5000)]
+    wrapped = [key for key in keys if hash_point(key) > points[-1] or hash_point(key) <= points[0]]
+    assert wrapped, "expected some keys on the wrap-around arc"
+
+    for key in keys:
+        assert owners(hash_point(key)) == [ring.node_for(key)]
+
+    # Both ends of the ring sit on the wrap-around arc of a single node
+    assert len(owners(0)) == 1
+    assert owners(0) == owners(RING_SIZE - 1)
+
+
+def test_workers_never_claim_a_job_twice(queue_path):
+    queue = ScrapeQueue(queue_path)
+    usernames = [f"user{i}" for i in range(120)]
+    for username in usernames:
+        queue.enqueue(username)
+
+    worker_ids = [f"w{i}" for i in range(4)]
+    # Register every worker up front so the ring is stable for the whole run
+    for worker_id in worker_ids:
+        queue.heartbeat(worker_id)
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_run_worker, args=(queue_path, worker_id, results))
+        for worker_id in worker_ids
+    ]
+    for process in processes:
+        process.start()
+    claimed = dict(results.get(timeout=60) for _ in processes)
+    for process in processes:
+        process.join(timeout=10)
+
+    all_claimed = [username for names in claimed.values() for username in names]
+    assert sorted(all_claimed) == sorted(usernames)
+    assert queue.stats() == {'done': len(usernames)}
+
+    ring = ConsistentHashRing(worker_ids)
+    for worker_id, names in claimed.items():
+        assert all(ring.node_for(username) == worker_id for username in names)
+    assert all(names for names in claimed.values())
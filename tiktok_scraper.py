@@ -8,6 +8,13 @@ import math
 import urllib.parse
 from urllib.parse import quote
 import os
+from extraction_strategies import (
+    StrategyChain,
+    EmbeddedJsonStrategy,
+    UserDetailApiStrategy,
+    ProfileNotFound,
+)
+from profiling import memory_checkpoint
 
 class TikTokScraper:
     def __init__(self):
@@ -22,9 +29,16 @@ class TikTokScraper:
         }
         self.session.headers.update(self.headers)
 
-    def get_profile_data(self, username):
+        # Ordered fetch/extract backends; reordered by observed latency at runtime
+        self.strategy_chain = StrategyChain([
+            EmbeddedJsonStrategy(),
+            UserDetailApiStrategy(),
+        ])
+
+    def get_profile_data(self, username, raise_not_found=False):
         """
-        Enhanced TikTok profile scraper with advanced regex patterns and comprehensive data extraction
+        Enhanced TikTok profile scraper with advanced regex patterns and comprehensive data extraction.
+        With raise_not_found, a missing profile raises ProfileNotFound instead of returning None.
         """
         try:
             # Clean username
@@ -33,80 +47,94 @@ class TikTokScraper:
             username = username.strip()
             
             # Get comprehensive user information using advanced scraping
-            return self._get_user_info_advanced(username)
+            return self._get_user_info_advanced(username, raise_not_found)
             
+        except ProfileNotFound:
+            raise
         except Exception as e:
             print(f"Error scraping profile {username}: {str(e)}")
             return None
 
-    def _get_user_info_advanced(self, username):
+    def _get_user_info_advanced(self, username, raise_not_found=False):
         """
-        Advanced user information extraction with comprehensive patterns
+        Advanced user information extraction, trying each backend in the strategy chain
         """
-        url = f"https://www.tiktok.com/@{username}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        if not username:
+            if raise_not_found:
+                raise ProfileNotFound("Empty username")
+            print("Error: Empty username")
+            return None
 
-        response = self.session.get(url, headers=headers)
+        try:
+            info = self.strategy_chain.run(self, username)
+        except ProfileNotFound:
+            if raise_not_found:
+                raise
+            print(f"Error: Profile {username} does not exist")
+            return None
 
-        if response.status_code == 200:
-            html_content = response.text
-            
-            # Try to use lxml parser if available, otherwise use html.parser
-            try:
-                soup = BeautifulSoup(html_content, 'lxml')
-            except:
-                soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Comprehensive regex patterns for data extraction
-            patterns = {
-                'user_id': r'"webapp.user-detail":{"userInfo":{"user":{"id":"(\d+)"',
-                'unique_id': r'"uniqueId":"(.*?)"',
-                'nickname': r'"nickname":"(.*?)"',
-                'followers': r'"followerCount":(\d+)',
-                'following': r'"followingCount":(\d+)',
-                'likes': r'"heartCount":(\d+)|"diggCount":(\d+)|"heart":(\d+)',
-                'videos': r'"videoCount":(\d+)',
-                'signature': r'"signature":"(.*?)"',
-                'verified': r'"verified":(true|false)',
-                'secUid': r'"secUid":"(.*?)"',
-                'commentSetting': r'"commentSetting":(\d+)',
-                'privateAccount': r'"privateAccount":(true|false)',
-                'region': r'"ttSeller":false,"region":"([^"]*)"',
-                'heart': r'"heart":(\d+)',
-                'diggCount': r'"diggCount":(\d+)',
-                'friendCount': r'"friendCount":(\d+)',
-                'profile_pic': r'"avatarLarger":"(.*?)"'
-            }
-            
-            # Extract information using the defined patterns
-            info = {}
+        if info is None:
+            print(f"Error: Unable to fetch profile {username} with any extraction strategy")
+            return None
 
-            for key, pattern in patterns.items():
-                match = re.search(pattern, html_content)
-                if match:
-                    groups = [g for g in match.groups() if g]  # pick the first non-empty group
-                    info[key] = groups[0] if groups else match.group(1)
-                else:
-                    info[key] = f"No {key} found"
+        # Process and calculate metrics
+        processed_data = self._process_profile_data(info, username)
+        return processed_data
 
-            # Process profile pic URL
-            if "profile_pic" in info:
-                info['profile_pic'] = info['profile_pic'].replace('\\u002F', '/')
-            
-            # Extract social links
-            social_links = self._extract_social_links(html_content, info.get('signature', ""))
-            info['social_links'] = social_links
-            
-            # Process and calculate metrics
-            processed_data = self._process_profile_data(info, username)
-            return processed_data
-            
-        else:
-            print(f"Error: Unable to fetch profile. Status code: {response.status_code}")
-            return None
+    def _extract_info_from_html(self, html_content):
+        """
+        Extract raw profile fields from a profile page using comprehensive patterns
+        """
+        # Try to use lxml parser if available, otherwise use html.parser
+        try:
+            soup = BeautifulSoup(html_content, 'lxml')
+        except:
+            soup = BeautifulSoup(html_content, 'html.parser')
+
+        # Page body and parse tree are both alive here; no-op unless profiling
+        memory_checkpoint("after_html_parse")
+        
+        # Comprehensive regex patterns for data extraction
+        patterns = {
+            'user_id': r'"webapp.user-detail":{"userInfo":{"user":{"id":"(\d+)"',
+            'unique_id': r'"uniqueId":"(.*?)"',
+            'nickname': r'"nickname":"(.*?)"',
+            'followers': r'"followerCount":(\d+)',
+            'following': r'"followingCount":(\d+)',
+            'likes': r'"heartCount":(\d+)|"diggCount":(\d+)|"heart":(\d+)',
+            'videos': r'"videoCount":(\d+)',
+            'signature': r'"signature":"(.*?)"',
+            'verified': r'"verified":(true|false)',
+            'secUid': r'"secUid":"(.*?)"',
+            'commentSetting': r'"commentSetting":(\d+)',
+            'privateAccount': r'"privateAccount":(true|false)',
+            'region': r'"ttSeller":(?:true|false),"region":"([^"]*)"',
+            'heart': r'"heart":(\d+)',
+            'diggCount': r'"diggCount":(\d+)',
+            'friendCount': r'"friendCount":(\d+)',
+            'profile_pic': r'"avatarLarger":"(.*?)"'
+        }
+        
+        # Extract information using the defined patterns
+        info = {}
+
+        for key, pattern in patterns.items():
+            match = re.search(pattern, html_content)
+            if match:
+                groups = [g for g in match.groups() if g]  # pick the first non-empty group
+                info[key] = groups[0] if groups else match.group(1)
+            else:
+                info[key] = f"No {key} found"
+
+        # Process profile pic URL
+        if "profile_pic" in info:
+            info['profile_pic'] = info['profile_pic'].replace('\\u002F', '/')
+        
+        # Extract social links
+        social_links = self._extract_social_links(html_content, info.get('signature', ""))
+        info['social_links'] = social_links
+        
+        return info
 
     def _extract_social_links(self, html_content, bio):
         """
@@ -302,6 +330,11 @@ class TikTokScraper:
             verified = info.get("verified", "false").lower() == "true" if isinstance(info.get("verified"), str) else bool(info.get("verified", False))
             private_account = info.get("privateAccount", "false").lower() == "true" if isinstance(info.get("privateAccount"), str) else bool(info.get("privateAccount", False))
             
+            # Region code (e.g. "US"); empty when the page doesn't expose one
+            region = info.get("region", "")
+            if not region or region.startswith("No "):
+                region = ""
+            
             # Return processed data in consistent format
             return {
                 'username': info.get('unique_id', username),
@@ -313,6 +346,7 @@ class TikTokScraper:
                 'video_count': videos,
                 'verified': verified,
                 'private_account': private_account,
+                'region': region,
                 'avatar_url': info.get('profile_pic', ''),
                 'social_links': info.get('social_links', []),
                 
@@ -0,0 +1,490 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from extraction_strategies import ProfileNotFound
+from profiling import profiling_enabled, profile_section
+
+# Shared scrape work queue. Several app containers point SCRAPE_QUEUE_DB at the
+# same SQLite file; usernames are routed to workers with a consistent-hash ring
+# so each node's cached scraper keeps seeing the same profiles.
+QUEUE_DB_ENV_VAR = "SCRAPE_QUEUE_DB"
+
+RING_SIZE = 2 ** 32
+
+
+def hash_point(key):
+    """
+    Stable 32-bit position of a key on the hash ring
+    """
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:4], 'big')
+
+
+def normalize_username(username):
+    username = username.strip()
+    if username.startswith('@'):
+        username = username[1:]
+    return username.lower()
+
+
+class ConsistentHashRing:
+    """
+    Consistent-hash ring with virtual nodes. Adding or removing a worker only
+    moves the usernames on the arcs next to its points.
+    """
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        for i in range(self.replicas):
+            point = hash_point(f"{node}#{i}")
+            if point in self._owners:
+                continue
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    @property
+    def nodes(self):
+        return set(self._owners.values())
+
+    def node_for(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect_left(self._points, hash_point(key))
+        if index == len(self._points):
+            index = 0
+        return self._owners[self._points[index]]
+
+    def owned_ranges(self, node):
+        """
+        Inclusive (low, high) hash ranges owned by a node, merged where adjacent
+        """
+        if not self._points:
+            return []
+
+        ranges = []
+        for i, point in enumerate(self._points):
+            if self._owners[point] != node:
+                continue
+            if i == 0:
+                # First point also owns the wrap-around arc past the last point
+                ranges.append((0, point))
+                if self._points[-1] < RING_SIZE - 1:
+                    ranges.append((self._points[-1] + 1, RING_SIZE - 1))
+            else:
+                ranges.append((self._points[i - 1] + 1, point))
+
+        ranges.sort()
+        merged = []
+        for low, high in ranges:
+            if merged and low <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+            else:
+                merged.append((low, high))
+        return merged
+
+
+class ScrapeQueue:
+    """
+    File-backed SQLite job queue with lease-based claiming.
+
+    Jobs move pending -> leased -> done, or back to pending on failure until
+    max_attempts is reached (then failed). A lease that expires without being
+    completed makes the job claimable again.
+    """
+
+    def __init__(self, path, lease_seconds=60, max_attempts=3, retry_delay=5, worker_ttl=30):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.worker_ttl = worker_ttl
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                hash_point INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                profile INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, hash_point);
+            CREATE INDEX IF NOT EXISTS jobs_username ON jobs (username, status);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            );
+        """)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- producers -------------------------------------------------------
+
+    def enqueue(self, username, profile=False):
+        """
+        Add a scrape job and return its id. A username that already has a
+        pending or leased job is not queued twice; the existing id is returned.
+        ``profile`` asks whichever worker runs the job to profile the scrape.
+        """
+        username = normalize_username(username)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE username = ? AND status IN ('pending', 'leased')",
+                (username,)
+            ).fetchone()
+            if row:
+                job_id = row['id']
+                if profile:
+                    conn.execute("UPDATE jobs SET profile = 1 WHERE id = ?", (job_id,))
+            else:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (username, hash_point, profile, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (username, hash_point(username), int(bool(profile)), now, now, now)
+                )
+                job_id = cursor.lastrowid
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def get_job(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def latest_result(self, username, max_age=None):
+        """
+        Most recent successful result for a username, optionally no older than max_age seconds
+        """
+        username = normalize_username(username)
+        row = self._connect().execute(
+            "SELECT result, updated_at FROM jobs WHERE username = ? AND status = 'done' "
+            "ORDER BY updated_at DESC LIMIT 1",
+            (username,)
+        ).fetchone()
+        if not row or (max_age is not None and time.time() - row['updated_at'] > max_age):
+            return None
+        return json.loads(row['result'])
+
+    def iter_results(self):
+        """
+        Latest successful result for every username in the queue
+        """
+        rows = self._connect().execute(
+            "SELECT j.result FROM jobs j JOIN ("
+            "  SELECT username, MAX(updated_at) AS updated_at FROM jobs"
+            "  WHERE status = 'done' GROUP BY username"
+            ") latest ON j.username = latest.username AND j.updated_at = latest.updated_at "
+            "WHERE j.status = 'done'"
+        )
+        for row in rows:
+            yield json.loads(row['result'])
+
+    def wait_for_result(self, job_id, timeout, poll_interval=0.5):
+        """
+        Block until a job is done or failed, returning the job dict, or None on timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job and job['status'] in ('done', 'failed'):
+                return job
+            if time.time() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def stats(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    # --- workers ---------------------------------------------------------
+
+    def heartbeat(self, worker_id):
+        self._connect().execute(
+            "INSERT INTO workers (worker_id, last_seen) VALUES (?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+            (worker_id, time.time())
+        )
+
+    def deregister(self, worker_id):
+        self._connect().execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self):
+        cutoff = time.time() - self.worker_ttl
+        rows = self._connect().execute(
+            "SELECT worker_id FROM workers WHERE last_seen >= ? ORDER BY worker_id", (cutoff,)
+        )
+        return [row['worker_id'] for row in rows]
+
+    def claim(self, worker_id, limit=1, ring=None):
+        """
+        Lease up to ``limit`` jobs routed to this worker by the consistent-hash
+        ring of live workers. Returns a list of job dicts.
+        """
+        if ring is None:
+            ring = ConsistentHashRing(set(self.live_workers()) | {worker_id})
+        ranges = ring.owned_ranges(worker_id)
+        if not ranges:
+            return []
+
+        range_sql = " OR ".join("hash_point BETWEEN ? AND ?" for _ in ranges)
+        range_params = [bound for r in ranges for bound in r]
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases that used up their attempts are failed, not re-run
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', lease_owner = NULL, "
+                "updated_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE ({range_sql}) AND ("
+                "  (status = 'pending' AND available_at <= ?)"
+                "  OR (status = 'leased' AND lease_expires < ?)"
+                ") ORDER BY available_at, id LIMIT ?",
+                range_params + [now, now, limit]
+            ).fetchall()
+            job_ids = [row['id'] for row in rows]
+            for job_id in job_ids:
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, job_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [self.get_job(job_id) for job_id in job_ids]
+
+    def claim_job(self, job_id, worker_id):
+        """
+        Lease one specific job regardless of routing, if nobody holds a live lease
+        on it. Used to take over a job instead of scraping it a second time.
+        """
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+            "attempts = attempts + 1, updated_at = ? "
+            "WHERE id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))",
+            (worker_id, now + self.lease_seconds, now, job_id, now)
+        )
+        return cursor.rowcount == 1
+
+    def extend_lease(self, job_id, worker_id):
+        """
+        Restart the lease clock on a job we still own. Returns False if the lease was lost.
+        """
+        cursor = self._connect().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + self.lease_seconds, time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        """
+        Mark a leased job done. Returns False if the lease was lost to another worker.
+        """
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+            "updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (json.dumps(result), time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker_id, error, permanent=False):
+        """
+        Release a leased job for retry after retry_delay, or mark it failed
+        once max_attempts is reached. A permanent failure (e.g. the profile
+        does not exist) is marked failed straight away.
+        """
+        now = time.time()
+        max_attempts = 0 if permanent else self.max_attempts
+        cursor = self._connect().execute(
+            "UPDATE jobs SET "
+            "  status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "  available_at = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (max_attempts, now + self.retry_delay, str(error), now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def _row_to_job(self, row):
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+class QueueWorker:
+    """
+    Claims jobs routed to this worker and runs them through a TikTokScraper.
+    ``on_result`` is called with each successfully stored profile.
+    """
+
+    def __init__(self, queue, scraper, worker_id=None, batch_size=4, poll_interval=1.0, on_result=None):
+        self.queue = queue
+        self.scraper = scraper
+        self.on_result = on_result
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run_once(self):
+        """
+        Heartbeat, claim one batch and process it. Returns the number of jobs handled.
+        """
+        self.queue.heartbeat(self.worker_id)
+        jobs = self.queue.claim(self.worker_id, limit=self.batch_size)
+
+        for job in jobs:
+            # Leases start at claim time; restart the clock so later jobs in a
+            # slow batch aren't reclaimed before we get to them
+            if not self.queue.extend_lease(job['id'], self.worker_id):
+                continue
+
+            permanent = False
+            try:
+                with profile_section("get_profile_data", job['profile'] or profiling_enabled()):
+                    result = self.scraper.get_profile_data(job['username'], raise_not_found=True)
+            except ProfileNotFound as e:
+                # Retrying can't make a missing profile appear
+                result = None
+                error = f"Profile not found: {str(e)}"
+                permanent = True
+            except Exception as e:
+                result = None
+                error = str(e)
+            else:
+                error = "No profile data returned"
+
+            if result:
+                if self.queue.complete(job['id'], self.worker_id, result) and self.on_result:
+                    try:
+                        self.on_result(result)
+                    except Exception as e:
+                        print(f"Error handling result for {job['username']}: {str(e)}")
+            else:
+                self.queue.fail(job['id'], self.worker_id, error, permanent=permanent)
+
+            # Keep our heartbeat fresh so the ring doesn't reassign our usernames mid-batch
+            self.queue.heartbeat(self.worker_id)
+
+        return len(jobs)
+
+    def run(self, idle_exit=None):
+        """
+        Process jobs until stopped, or until the queue has been idle for idle_exit seconds
+        """
+        idle_since = time.time()
+        try:
+            while not self._stop_event.is_set():
+                if self.run_once():
+                    idle_since = time.time()
+                    continue
+                if idle_exit is not None and time.time() - idle_since >= idle_exit:
+                    break
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            self.queue.deregister(self.worker_id)
+
+
+def start_background_worker(queue, scraper, **kwargs):
+    """
+    Run a QueueWorker on a daemon thread inside the app process
+    """
+    worker = QueueWorker(queue, scraper, **kwargs)
+    thread = threading.Thread(target=worker.run, name=f"scrape-worker-{worker.worker_id}", daemon=True)
+    thread.start()
+    return worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared TikTok scrape work queue")
+    parser.add_argument('--db', default=os.environ.get(QUEUE_DB_ENV_VAR, 'scrape_queue.db'),
+                        help="Path to the shared SQLite queue file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help="Queue usernames for scraping")
+    enqueue_parser.add_argument('usernames', nargs='+')
+
+    worker_parser = subparsers.add_parser('worker', help="Run a worker process")
+    worker_parser.add_argument('--worker-id')
+    worker_parser.add_argument('--batch-size', type=int, default=4)
+    worker_parser.add_argument('--idle-exit', type=float, default=None,
+                               help="Exit after this many idle seconds")
+    worker_parser.add_argument('--cohort-db',
+                               help="Cohort rollup store to record results into (default: $COHORT_DB)")
+
+    subparsers.add_parser('stats', help="Show job counts by status")
+
+    args = parser.parse_args()
+    queue = ScrapeQueue(args.db)
+
+    if args.command == 'enqueue':
+        for username in args.usernames:
+            print(f"{username}: job {queue.enqueue(username)}")
+    elif args.command == 'worker':
+        from tiktok_scraper import TikTokScraper
+        from cohort_rollups import COHORT_DB_ENV_VAR, DEFAULT_COHORT_DB, CohortStore
+        cohort_db = args.cohort_db or os.environ.get(COHORT_DB_ENV_VAR, DEFAULT_COHORT_DB)
+        on_result = CohortStore(cohort_db).record_profile
+        worker = QueueWorker(queue, TikTokScraper(), worker_id=args.worker_id, batch_size=args.batch_size,
+                             on_result=on_result)
+        print(f"Worker {worker.worker_id} started on {args.db}")
+        worker.run(idle_exit=args.idle_exit)
+    elif args.command == 'stats':
+        print(json.dumps(queue.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()